@@ -1,13 +1,29 @@
+import hashlib
+import re
 from pathlib import Path
 
-import regex as re
-from bs4 import BeautifulSoup, Tag
+from bs4 import BeautifulSoup, SoupStrainer, Tag
 
 KNOWLEDGEBASE_DIR = "knowledgebase"
 DIRECTIVE_FILE = "directive.html"
 
 
 class DirectiveProcessor:
+    _SPECIAL_CHARS = str.maketrans({"‘": '"', "’": '"', "\t": " "})
+    _RE_ENUM_LETTER = re.compile(r"^(\(\w+\))(\w)", re.MULTILINE)
+    _RE_ENUM_NUMBER = re.compile(r"^([\d\.]+)\n\s\n?(\w)", re.MULTILINE)
+    _RE_HEADING = re.compile(r"^(Article|CHAPTER|TITLE|PART|ANNEX) (\w+)$", re.MULTILINE)
+    _RE_LINE_EDGES = re.compile(r"^[ \t]+|[ \t]+$", re.MULTILINE)
+    _RE_BLANK_LINES = re.compile(r"\n{2,}")
+
+    _HEADING_PREFIXES = {
+        "Article": "",
+        "CHAPTER": "### ",
+        "TITLE": "## ",
+        "PART": "# ",
+        "ANNEX": "# ",
+    }
+
     def __init__(self) -> None:
         self._directive_filepath = Path(__file__).parent / KNOWLEDGEBASE_DIR / DIRECTIVE_FILE
         self._ensure_directive()
@@ -16,10 +32,9 @@ class DirectiveProcessor:
         result = []
 
         for tr in table.find_all("tr"):
-            row_cells = []
-            for cell in tr.find_all(["td", "th"]):
-                cell_text = " ".join(cell.get_text(strip=False).split())
-                row_cells.append(cell_text)
+            # split/join normalizes whitespace inside text nodes too (the
+            # headings carry non-breaking spaces); empty cells are dropped.
+            row_cells = [text for cell in tr.find_all(["td", "th"]) if (text := " ".join(cell.get_text().split()))]
 
             if row_cells:
                 result.append(" ".join(row_cells))
@@ -30,23 +45,26 @@ class DirectiveProcessor:
         return ""
 
     def process_element(self, element: Tag) -> str:
-        if element.name == "table":
-            return self.process_table(element)
-
-        if element.name == "p":
-            text = " ".join(element.get_text(strip=False).split())
-
-            return f"\n{text.strip()}\n"
-
+        # Iterative traversal - avoids per-node call overhead and recursion
+        # limits on deeply nested tables.
         text_parts = []
-        for child in element.children:
-            if isinstance(child, Tag):
-                processed = self.process_element(child)
-                if processed:
+        stack: list[Tag | str] = [element]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                if node := node.strip():
+                    text_parts.append(node)
+
+            elif node.name == "table":
+                if processed := self.process_table(node):
                     text_parts.append(processed)
 
-            elif isinstance(child, str) and child.strip():
-                text_parts.append(child.strip())
+            elif node.name == "p":
+                text = " ".join(node.get_text().split())
+                text_parts.append(f"\n{text}\n")
+
+            else:
+                stack.extend(reversed(node.contents))
 
         return " ".join(text_parts)
 
@@ -57,53 +75,47 @@ class DirectiveProcessor:
         return text.strip()
 
     def clean_text(self) -> str:
-        with open(self._directive_filepath, "r") as f:
-            soup = BeautifulSoup(f, "html.parser")
-
-        for element in soup(["script", "style"]):
-            element.decompose()
+        with open(self._directive_filepath, "rb") as f:
+            # lxml parses the large directive HTML several times faster than html.parser;
+            # passing bytes with a declared encoding skips encoding auto-detection.
+            # The strainer restricts tree construction to the content containers,
+            # so scripts, styles and navigation are never materialized.
+            strainer = SoupStrainer("div", class_="eli-container")
+            soup = BeautifulSoup(f.read(), "lxml", from_encoding="utf-8", parse_only=strainer)
 
         main_contents = soup.find_all("div", class_="eli-container")
 
-        processed_text = ""
+        parts = []
         for main_content in main_contents:
-            processed_text += "\n" + self.apply_processed_transforms(self.process_element(main_content))
-
-        lines = []
-        for line in processed_text.split("\n"):
-            if not (line := line.strip()):
-                continue
+            parts.append(self.apply_processed_transforms(self.process_element(main_content)))
 
-            lines.append(self._apply_headings_spacing(line))
+        processed_text = "\n".join(parts)
 
-        text = "\n".join(lines)
+        # Per-line strip and blank-line removal run as regex passes at C speed
+        # instead of a Python loop over every line.
+        text = self._RE_LINE_EDGES.sub("", processed_text)
+        text = self._RE_BLANK_LINES.sub("\n", text).strip()
 
-        return text
+        return self._apply_headings_spacing(text)
 
     def _remove_special_chars(self, text: str) -> str:
-        text = re.sub(r"[‘’]", '"', text)
-        return re.sub(r"\t", " ", text)
+        return text.translate(self._SPECIAL_CHARS)
 
     def _apply_enumerate_spacing(self, text: str) -> str:
-        text = re.sub(r"^(\(\w+\))(\w)", r"\1 \2", text, flags=re.MULTILINE)
-        return re.sub(r"^([\d\.]+)\n\s\n?(\w)", r"\1 \2", text, flags=re.MULTILINE)
+        text = self._RE_ENUM_LETTER.sub(r"\1 \2", text)
+        return self._RE_ENUM_NUMBER.sub(r"\1 \2", text)
 
     def _apply_headings_spacing(self, text: str) -> str:
-        if "Article" in text:
-            prefix = ""
-        elif "CHAPTER" in text:
-            prefix = "### "
-        elif "TITLE" in text:
-            prefix = "## "
-        elif "PART" in text:
-            prefix = "# "
-        elif "ANNEX" in text:
-            prefix = "# "
-        else:
-            # No heading
-            return text
-
-        return re.sub(r"^(Article|CHAPTER|TITLE|PART|ANNEX) (\w+)$", rf"\n{prefix}\1 \2", text)
+        return self._RE_HEADING.sub(self._heading_sub, text)
+
+    def _heading_sub(self, match: re.Match) -> str:
+        prefix = self._HEADING_PREFIXES[match.group(1)]
+
+        return f"\n{prefix}{match.group(1)} {match.group(2)}"
+
+    def content_hash(self) -> str:
+        """Hash of the raw directive HTML, used to invalidate derived caches."""
+        return hashlib.sha256(self._directive_filepath.read_bytes()).hexdigest()
 
     def _ensure_directive(self) -> None:
         if self._directive_filepath.exists():
@@ -1,6 +1,7 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 
-import regex as re
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
@@ -14,39 +15,39 @@ class Article:
     content: str
 
 
+# Per-process splitter set up by the pool initializer; article splitting is
+# pure CPU work and independent between articles, so worker processes each
+# hold their own instance.
+_worker_splitter: "DocumentSplitter | None" = None
+
+
+def _init_worker(chunk_size: int, chunk_overlap: int) -> None:
+    global _worker_splitter
+    _worker_splitter = DocumentSplitter(chunk_size, chunk_overlap)
+
+
+def _split_article(task: tuple[Article, dict]) -> list[Document]:
+    article, metadata = task
+    return _worker_splitter._split_article_content(article, metadata)
+
+
 class DocumentSplitter:
     def __init__(self, chunk_size: int = 2000, chunk_overlap: int = 200) -> None:
-        self._patterns = {
-            "part": re.compile(r"^# (PART \w+)\n(.*)$", re.MULTILINE),
-            "title": re.compile(r"^## (TITLE \w+)\n(.*)$", re.MULTILINE),
-            "chapter": re.compile(r"^### (CHAPTER \w+)\n(.*)$", re.MULTILINE),
-            "article": re.compile(r"^(Article \w+)\n(.*)$", re.MULTILINE),
-            "annex": re.compile(r"^# (ANNEX \w+)\n(.*)$", re.MULTILINE),
-        }
+        self._chunk_size = chunk_size
+        self._chunk_overlap = chunk_overlap
+        # One alternation matching every section boundary, so the text is
+        # scanned once instead of once per section type and nesting level.
+        self._section_pattern = re.compile(
+            r"^(?:# (?P<part>PART \w+)"
+            r"|## (?P<title>TITLE \w+)"
+            r"|### (?P<chapter>CHAPTER \w+)"
+            r"|(?P<article>Article \w+)"
+            r"|# (?P<annex>ANNEX \w+))"
+            r"\n(?P<description>.*)$",
+            re.MULTILINE,
+        )
         self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
 
-    def _process_section(
-        self,
-        ind: int,
-        curr_match: re.Match,
-        curr_matches: list[re.Match],
-        parent_text: str,
-        match_section: str,
-        futher_matches: list[re.Match] | None = None,  # Matches for Annexes - only needed for the last PART
-    ) -> tuple[list[re.Match], str]:
-        """Process a section and get its subsections."""
-        next_match_start = None
-        if ind + 1 != len(curr_matches):
-            next_match_start = curr_matches[ind + 1].start()
-        elif futher_matches is not None:
-            # Last PART - get the start of the next section
-            next_match_start = futher_matches[0].start()
-
-        current_text = parent_text[curr_match.start() : next_match_start]
-        subsection_matches = list(self._patterns[match_section].finditer(current_text))
-
-        return subsection_matches, current_text
-
     def _split_article_content(self, article: Article, metadata: dict) -> list[Document]:
         if len(article.content) <= self.text_splitter._chunk_size:
             return [
@@ -84,82 +85,69 @@ class DocumentSplitter:
 
         return chunks
 
-    def _process_articles(self, matches: list[re.Match], text: str, metadata: dict) -> list[Document]:
-        """Process articles within a section and split into smaller chunks."""
-        chunks = []
-        for a_i, curr_article in enumerate(matches):
-            next_article_start = None
-            if a_i + 1 != len(matches):
-                next_article_start = matches[a_i + 1].start()
-
-            article_text = text[curr_article.start() : next_article_start]
-            article = Article(
-                identifier=curr_article.group(1),
-                description=curr_article.group(2) or "UNDEFINED",
-                content=article_text,
-            )
+    def _collect_articles(
+        self, section_matches: list[re.Match], text: str, annex_start: int | None
+    ) -> list[tuple[Article, dict]]:
+        """Walk the boundary stream and pair each article with its enclosing section metadata."""
+        articles = []
+        part_metadata: dict | None = None
+        title_metadata: dict | None = None
+        chapter_metadata: dict | None = None
+
+        for ind, match in enumerate(section_matches):
+            description = match.group("description") or "UNDEFINED"
+
+            if match.group("part") is not None:
+                part_metadata = {
+                    "type": "part",
+                    "part": match.group("part"),
+                    "part_description": description,
+                }
+                title_metadata = None
+                chapter_metadata = None
+
+            elif match.group("title") is not None:
+                title_metadata = {
+                    **(part_metadata or {}),
+                    "type": "title",
+                    "title": match.group("title"),
+                    "title_description": description,
+                }
+                chapter_metadata = None
+
+            elif match.group("chapter") is not None:
+                chapter_metadata = {
+                    **(title_metadata or part_metadata or {}),
+                    "type": "chapter",
+                    "chapter": match.group("chapter"),
+                    "chapter_description": description,
+                }
 
-            article_chunks = self._split_article_content(article, metadata)
-            chunks.extend(article_chunks)
+            else:
+                next_start = annex_start
+                if ind + 1 != len(section_matches):
+                    next_start = section_matches[ind + 1].start()
+
+                article = Article(
+                    identifier=match.group("article"),
+                    description=description,
+                    content=text[match.start() : next_start],
+                )
+                metadata = chapter_metadata or title_metadata or part_metadata or {}
+                articles.append((article, metadata))
 
-        return chunks
+        return articles
 
-    def create_chunks(self, text: str) -> list[Document]:
-        """Create chunks based on document structure and size limits."""
+    def _process_annexes(self, annex_matches: list[re.Match], text: str) -> list[Document]:
+        """Split annexes into chunks; the last annex is a correlation table and is dropped."""
         chunks = []
-        part_matches = list(self._patterns["part"].finditer(text))
-        annex_matches = list(self._patterns["annex"].finditer(text))
-
-        # Process parts
-        for p_i, curr_part in enumerate(part_matches):
-            part_metadata = {
-                "type": "part",
-                "part": curr_part.group(1),
-                "part_description": curr_part.group(2) or "UNDEFINED",
+        for a_i, curr_annex in enumerate(annex_matches):
+            annex_metadata = {
+                "type": "annex",
+                "annex": curr_annex.group("annex"),
+                "annex_description": curr_annex.group("description") or "UNDEFINED",
             }
 
-            title_matches, part_text = self._process_section(p_i, curr_part, part_matches, text, "title")
-
-            if title_matches:
-                for t_i, curr_title in enumerate(title_matches):
-                    title_metadata = {
-                        **part_metadata,
-                        "title": curr_title.group(1),
-                        "title_description": curr_title.group(2) or "UNDEFINED",
-                    }
-
-                    chapter_matches, title_text = self._process_section(t_i, curr_title, title_matches, part_text, "chapter")
-
-                    if chapter_matches:
-                        for c_i, curr_chapter in enumerate(chapter_matches):
-                            chapter_metadata = {
-                                **title_metadata,
-                                "type": "chapter",
-                                "chapter": curr_chapter.group(1),
-                                "chapter_description": curr_chapter.group(2) or "UNDEFINED",
-                            }
-
-                            article_matches, chapter_text = self._process_section(
-                                c_i, curr_chapter, chapter_matches, title_text, "article"
-                            )
-                            chunks.extend(self._process_articles(article_matches, chapter_text, chapter_metadata))
-                    else:
-                        article_matches, title_text = self._process_section(
-                            t_i, curr_title, title_matches, part_text, "article"
-                        )
-                        chunks.extend(self._process_articles(article_matches, title_text, {**title_metadata, "type": "title"}))
-            else:
-                article_matches, part_text = self._process_section(
-                    p_i,
-                    curr_part,
-                    part_matches,
-                    text,
-                    "article",
-                    futher_matches=annex_matches,
-                )
-                chunks.extend(self._process_articles(article_matches, part_text, part_metadata))
-
-        for a_i, curr_annex in enumerate(annex_matches):
             if a_i + 1 < len(annex_matches):
                 next_annex_start = annex_matches[a_i + 1].start()
 
@@ -167,18 +155,12 @@ class DocumentSplitter:
 
                 annex_chunks = self.text_splitter.create_documents(
                     texts=[annex_text],
-                    metadatas=[
-                        {
-                            "type": "annex",
-                            "annex": curr_annex.group(1),
-                            "annex_description": curr_annex.group(2) or "UNDEFINED",
-                        }
-                    ],
+                    metadatas=[annex_metadata],
                 )
 
                 for i, chunk in enumerate(annex_chunks):
                     if i != 0:
-                        prefix = f"{curr_annex.group(1)}\n{curr_annex.group(2) or 'UNDEFINED'}\n"
+                        prefix = f"{curr_annex.group('annex')}\n{curr_annex.group('description') or 'UNDEFINED'}\n"
                         chunk.page_content = prefix + chunk.page_content
 
                     chunk.metadata["chunk_index"] = i
@@ -188,16 +170,37 @@ class DocumentSplitter:
 
             else:
                 # Last annex - correlation table that needs to be removed
-                annex_text = "Correlation table - not included"
                 chunks.append(
                     Document(
-                        page_content=annex_text,
-                        metadata={
-                            "type": "annex",
-                            "annex": curr_annex.group(1),
-                            "annex_description": curr_annex.group(2) or "UNDEFINED",
-                        },
+                        page_content="Correlation table - not included",
+                        metadata=annex_metadata,
                     )
                 )
 
         return chunks
+
+    def create_chunks(self, text: str) -> list[Document]:
+        """Create chunks based on document structure and size limits."""
+        matches = list(self._section_pattern.finditer(text))
+
+        # Annexes trail the document; boundary-looking lines inside them must
+        # not be treated as structural sections.
+        first_annex = next((i for i, m in enumerate(matches) if m.group("annex") is not None), len(matches))
+        section_matches = matches[:first_annex]
+        annex_matches = [m for m in matches[first_annex:] if m.group("annex") is not None]
+
+        annex_start = annex_matches[0].start() if annex_matches else None
+
+        articles = self._collect_articles(section_matches, text, annex_start)
+
+        # Articles are split in parallel - each split is independent CPU work.
+        chunks = []
+        with ProcessPoolExecutor(
+            initializer=_init_worker, initargs=(self._chunk_size, self._chunk_overlap)
+        ) as executor:
+            for article_chunks in executor.map(_split_article, articles, chunksize=8):
+                chunks.extend(article_chunks)
+
+        chunks.extend(self._process_annexes(annex_matches, text))
+
+        return chunks
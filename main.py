@@ -1,17 +1,31 @@
+from pathlib import Path
+
 import gradio as gr
 
 from directive_bot import DirectiveProcessor, DirectiveRAG, DocumentSplitter
+from directive_bot.directive_rag import FAISS_DIR
+
+DIRECTIVE_HASH_FILE = Path("directive_hash.sha256")
 
 
 def main():
     processor = DirectiveProcessor()
-    chunker = DocumentSplitter()
     rag = DirectiveRAG()
 
-    text = processor.clean_text()
-    chunks = chunker.create_chunks(text)
+    directive_hash = processor.content_hash()
+    index_current = (
+        FAISS_DIR.exists() and DIRECTIVE_HASH_FILE.exists() and DIRECTIVE_HASH_FILE.read_text() == directive_hash
+    )
+
+    if index_current:
+        # The saved index already covers this directive - skip parsing and chunking.
+        rag.load_store([])
+    else:
+        chunker = DocumentSplitter()
+        chunks = chunker.create_chunks(processor.clean_text())
 
-    rag.load_store(chunks)
+        rag.load_store(chunks, rebuild=True)
+        DIRECTIVE_HASH_FILE.write_text(directive_hash)
 
     iface = gr.ChatInterface(rag.query, type="messages")
     iface.launch(show_error=True)